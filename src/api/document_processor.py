@@ -1,56 +1,377 @@
-from typing import List, Dict, Any, Optional
-import hashlib
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Mapping
 import re
+from collections import ChainMap, deque
 from dataclasses import dataclass
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 import logging
-import nltk
+import threading
+from functools import lru_cache
+import numpy as np
+import spacy
+from spacy.tokens import Doc
 from bs4 import BeautifulSoup
 import fitz  # PyMuPDF
-from markdown import markdown
+from markdown import Markdown
 import html2text
+from blake3 import blake3
+from src.runtime.pools import CPU_WORKERS, cpu_pool, run_in_pool
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional, fall back to plain Python
+    NUMBA_AVAILABLE = False
+    def njit(**kwargs):
+        return lambda func: func
+
+# Universal POS tags counted as content words for the information density score
+CONTENT_POS = frozenset({"NOUN", "VERB", "ADJ", "ADV"})
+
+# Longest piece of text handed to spaCy at once. Documents are split below
+# nlp.max_length (1,000,000 chars) so large uploads never hit error E088.
+SEGMENT_CHARS = 100_000
+
+@lru_cache(maxsize=1)
+def _load_pipeline() -> spacy.language.Language:
+    """Load the spaCy pipeline once per process: tagger + senter only."""
+    nlp = spacy.load("en_core_web_sm", disable=["parser", "ner", "lemmatizer"])
+    nlp.enable_pipe("senter")
+    return nlp
+
+# Cleaning patterns. Both only match text that actually changes: single
+# spaces are left alone and runs of special characters go in one match.
+_WS = re.compile(r'\s\s+|[^\S ]')
+_SPECIAL = re.compile(r'[^\w\s.,!?-]+')
+
+# Markdown converters are reusable after reset(). HTML2Text is not: open
+# <style>/<blockquote> state leaks into the next handle() call, so it is
+# built per document (construction is microseconds next to parsing).
+_converters = threading.local()
+
+def _markdown_to_html(content: str) -> str:
+    """Render markdown with a per-thread, reused Markdown instance."""
+    md = getattr(_converters, 'markdown', None)
+    if md is None:
+        md = _converters.markdown = Markdown()
+    try:
+        return md.convert(content)
+    finally:
+        md.reset()
+
+def _normalize(content: str) -> str:
+    """Collapse whitespace and strip special characters."""
+    content = _WS.sub(' ', content)  # Normalize whitespace
+    content = _SPECIAL.sub('', content)  # Remove special characters
+    return content.strip()
+
+def _segments(text: str) -> Iterator[str]:
+    """Split text into pieces of at most SEGMENT_CHARS, preferring sentence ends."""
+    start = 0
+    while len(text) - start > SEGMENT_CHARS:
+        end = start + SEGMENT_CHARS
+        cut = max(text.rfind('. ', start, end), text.rfind('! ', start, end), text.rfind('? ', start, end))
+        if cut <= start:
+            cut = text.rfind(' ', start, end)
+        cut = cut + 1 if cut > start else end
+        yield text[start:cut]
+        start = cut
+    yield text[start:]
+
+def _iter_pdf_pages(data: bytes) -> Iterator[str]:
+    """Yield the cleaned text of each non-empty PDF page."""
+    with fitz.open("pdf", data) as doc:
+        for page in doc:
+            text = _normalize(page.get_text())
+            if text:
+                yield text
+
+@lru_cache(maxsize=256)
+def _clean_text(content: str, doc_type: str) -> str:
+    """Clean and normalize document content based on type.
+
+    Pure and cached: re-ingesting an identical document skips the parse.
+    """
+    if doc_type == 'html':
+        # Convert HTML to markdown and then to plain text
+        html_converter = html2text.HTML2Text()
+        html_converter.ignore_links = True
+        content = html_converter.handle(content)
+    elif doc_type == 'pdf':
+        # Extract text from PDF
+        return " ".join(_iter_pdf_pages(content.encode()))
+    elif doc_type == 'markdown':
+        # Convert markdown to plain text
+        content = html2text.html2text(_markdown_to_html(content))
+    
+    return _normalize(content)
+
+@njit(cache=True)
+def _chunk_bounds(lens: np.ndarray, chunk_size: int, overlap: int):
+    """Compute [start, end) sentence indices of overlapping chunks.
+
+    ``lens`` holds the word count of each sentence. Overlap is counted in
+    sentences, as in the original list-based chunker.
+    """
+    n = lens.shape[0]
+    starts = np.empty(n, dtype=np.int64)
+    ends = np.empty(n, dtype=np.int64)
+    count = 0
+    start = 0
+    size = 0
+    
+    for i in range(n):
+        if size + lens[i] > chunk_size:
+            # Save current chunk
+            if i > start:
+                starts[count] = start
+                ends[count] = i
+                count += 1
+            
+            # Start new chunk with overlap, dropping sentences from the left
+            new_start = max(start, i - overlap)
+            for j in range(start, new_start):
+                size -= lens[j]
+            start = new_start
+        size += lens[i]
+    
+    # Add final chunk
+    if n > start:
+        starts[count] = start
+        ends[count] = n
+        count += 1
+    
+    return starts[:count], ends[:count]
+
+# Factors for quality score
+QUALITY_FACTORS = {
+    'length': 0.3,  # Optimal length
+    'coherence': 0.3,  # Sentence coherence
+    'info_density': 0.4  # Information density
+}
+
+def _quality_score(word_count: int, sentence_count: int, content_words: int, chunk_size: int) -> float:
+    """Calculate a quality score from a chunk's word, sentence and content-word counts."""
+    scores = {
+        'length': min(word_count / chunk_size, 1.0),
+        'coherence': min(sentence_count / 5, 1.0),
+        'info_density': content_words / max(word_count, 1)
+    }
+    
+    # Calculate weighted score
+    total_score = sum(scores[metric] * weight for metric, weight in QUALITY_FACTORS.items())
+    
+    return round(total_score, 3)
 
 @dataclass
 class ProcessedChunk:
     content: str
-    metadata: Dict[str, Any]
+    metadata: Mapping[str, Any]
     hash: str
     quality_score: float
 
+@dataclass
+class Sentence:
+    text: str
+    word_count: int
+    content_words: int
+
+def _split_sentences(doc: Doc) -> List[Sentence]:
+    """Collect the sentences of a parsed document with their word counts."""
+    return [
+        Sentence(
+            text=sent.text,
+            word_count=len(sent),
+            content_words=sum(1 for token in sent if token.pos_ in CONTENT_POS)
+        )
+        for sent in doc.sents
+    ]
+
+def _rolling_chunks(sentences: Iterable[Sentence], chunk_size: int, chunk_overlap: int) -> Iterator[List[Sentence]]:
+    """Yield overlapping chunks from a stream of sentences.
+    
+    The window keeps a running word count, so every sentence is added and
+    dropped exactly once.
+    """
+    window = deque()
+    current_size = 0
+    
+    for sentence in sentences:
+        if current_size + sentence.word_count > chunk_size:
+            # Save current chunk
+            if window:
+                yield list(window)
+            
+            # Keep the last chunk_overlap sentences as overlap
+            while len(window) > chunk_overlap:
+                current_size -= window.popleft().word_count
+        
+        window.append(sentence)
+        current_size += sentence.word_count
+    
+    # Add final chunk
+    if window:
+        yield list(window)
+
+def _create_chunks(sentences: List[Sentence], chunk_size: int, chunk_overlap: int) -> List[List[Sentence]]:
+    """Split sentences into overlapping chunks."""
+    if not NUMBA_AVAILABLE:
+        return list(_rolling_chunks(sentences, chunk_size, chunk_overlap))
+    
+    lens = np.fromiter(
+        (s.word_count for s in sentences),
+        dtype=np.int32,
+        count=len(sentences)
+    )
+    starts, ends = _chunk_bounds(lens, chunk_size, chunk_overlap)
+    return [sentences[start:end] for start, end in zip(starts, ends)]
+
+def _process_chunks(chunks: Iterable[List[Sentence]], metadata: Dict[str, Any], chunk_size: int) -> List[ProcessedChunk]:
+    """Hash and score chunks."""
+    processed_chunks = []
+    
+    for sentences in chunks:
+        chunk = ' '.join(s.text for s in sentences)
+        word_count = sum(s.word_count for s in sentences)
+        
+        # Calculate chunk hash
+        chunk_hash = blake3(chunk.encode()).hexdigest()
+        
+        # Calculate quality score
+        quality_score = _quality_score(
+            word_count=word_count,
+            sentence_count=len(sentences),
+            content_words=sum(s.content_words for s in sentences),
+            chunk_size=chunk_size
+        )
+        
+        # Chunk metadata: per-chunk fields layered over the shared document metadata
+        chunk_metadata = ChainMap({
+            'chunk_hash': chunk_hash,
+            'chunk_size': word_count,
+            'quality_score': quality_score
+        }, metadata)
+        
+        processed_chunks.append(ProcessedChunk(
+            content=chunk,
+            metadata=chunk_metadata,
+            hash=chunk_hash,
+            quality_score=quality_score
+        ))
+    
+    return processed_chunks
+
+def _chunk_documents(
+    texts: List[str],
+    metadatas: List[Dict[str, Any]],
+    chunk_size: int,
+    chunk_overlap: int,
+    batch_size: int
+) -> List[List[ProcessedChunk]]:
+    """Parse, chunk and score a batch of cleaned documents.
+    
+    Runs in a cpu_pool worker; each worker process loads its own pipeline.
+    Long documents are parsed segment by segment and their sentences joined.
+    """
+    pieces = ((segment, i) for i, text in enumerate(texts) for segment in _segments(text))
+    sentences: List[List[Sentence]] = [[] for _ in texts]
+    for doc, i in _load_pipeline().pipe(pieces, as_tuples=True, batch_size=batch_size):
+        sentences[i].extend(_split_sentences(doc))
+    return [
+        _process_chunks(
+            _create_chunks(doc_sentences, chunk_size, chunk_overlap),
+            metadata,
+            chunk_size
+        )
+        for doc_sentences, metadata in zip(sentences, metadatas)
+    ]
+
+def _chunk_pdf(
+    data: bytes,
+    metadata: Dict[str, Any],
+    chunk_size: int,
+    chunk_overlap: int,
+    batch_size: int
+) -> List[ProcessedChunk]:
+    """Parse, chunk and score a PDF page by page.
+    
+    Pages are cleaned, parsed and chunked as a stream, so neither the full
+    text nor a whole-document Doc is ever materialized. Runs in a cpu_pool
+    worker.
+    """
+    pages = (segment for page in _iter_pdf_pages(data) for segment in _segments(page))
+    docs = _load_pipeline().pipe(pages, batch_size=batch_size)
+    sentences = (sentence for doc in docs for sentence in _split_sentences(doc))
+    return _process_chunks(
+        _rolling_chunks(sentences, chunk_size, chunk_overlap),
+        metadata,
+        chunk_size
+    )
+
 class DocumentProcessor:
-    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 64):
+    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 64, batch_size: int = 32):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.batch_size = batch_size
+        self.executor = cpu_pool
         self.logger = logging.getLogger(__name__)
-        
-        # Initialize NLTK
-        try:
-            nltk.download('punkt', quiet=True)
-            nltk.download('averaged_perceptron_tagger', quiet=True)
-        except Exception as e:
-            self.logger.warning(f"NLTK download failed: {str(e)}")
 
     async def process_document(self, content: str, metadata: Dict[str, Any]) -> List[ProcessedChunk]:
         """Process a document into optimized chunks."""
+        results = await self.process_documents([(content, metadata)])
+        return results[0]
+
+    async def process_documents(
+        self,
+        documents: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[List[ProcessedChunk]]:
+        """Process a batch of documents into optimized chunks."""
         try:
-            # Clean and normalize content
-            cleaned_content = await self._clean_content(content, metadata.get('type', 'text'))
+            results: List[Optional[List[ProcessedChunk]]] = [None] * len(documents)
+            text_indices, texts, metadatas = [], [], []
+            pdf_jobs = {}
             
-            # Split into chunks
-            chunks = await self._create_chunks(cleaned_content)
+            for i, (content, metadata) in enumerate(documents):
+                doc_type = metadata.get('type', 'text')
+                if doc_type == 'pdf':
+                    # PDFs are streamed page by page inside the worker
+                    pdf_jobs[i] = run_in_pool(
+                        self.executor,
+                        _chunk_pdf,
+                        content.encode(),
+                        metadata,
+                        self.chunk_size,
+                        self.chunk_overlap,
+                        self.batch_size
+                    )
+                else:
+                    # Clean and normalize content
+                    text_indices.append(i)
+                    texts.append(await self._clean_content(content, doc_type))
+                    metadatas.append(metadata)
             
-            # Process chunks in parallel
-            loop = asyncio.get_event_loop()
-            processed_chunks = await loop.run_in_executor(
-                self.executor,
-                self._process_chunks,
-                chunks,
-                metadata
-            )
+            # Tokenize, chunk and score in a single spaCy pass per document,
+            # sharding the batch so every cpu_pool worker gets a slice
+            jobs = list(pdf_jobs.values())
+            shard_size = max(1, -(-len(texts) // CPU_WORKERS))
+            for start in range(0, len(texts), shard_size):
+                jobs.append(run_in_pool(
+                    self.executor,
+                    _chunk_documents,
+                    texts[start:start + shard_size],
+                    metadatas[start:start + shard_size],
+                    self.chunk_size,
+                    self.chunk_overlap,
+                    self.batch_size
+                ))
+            chunked = await asyncio.gather(*jobs)
             
-            return processed_chunks
+            for i, chunks in zip(pdf_jobs, chunked):
+                results[i] = chunks
+            text_chunks = (chunks for shard in chunked[len(pdf_jobs):] for chunks in shard)
+            for i, chunks in zip(text_indices, text_chunks):
+                results[i] = chunks
+            
+            return results
             
         except Exception as e:
             self.logger.error(f"Error processing document: {str(e)}")
@@ -59,128 +380,8 @@ class DocumentProcessor:
     async def _clean_content(self, content: str, doc_type: str) -> str:
         """Clean and normalize document content based on type."""
         try:
-            if doc_type == 'html':
-                # Convert HTML to markdown and then to plain text
-                html_converter = html2text.HTML2Text()
-                html_converter.ignore_links = True
-                content = html_converter.handle(content)
-            elif doc_type == 'pdf':
-                # Extract text from PDF
-                doc = fitz.open("pdf", content.encode())
-                content = " ".join(page.get_text() for page in doc)
-            elif doc_type == 'markdown':
-                # Convert markdown to plain text
-                content = html2text.html2text(markdown(content))
-            
-            # General cleaning
-            content = re.sub(r'\s+', ' ', content)  # Normalize whitespace
-            content = re.sub(r'[^\w\s.,!?-]', '', content)  # Remove special characters
-            content = content.strip()
-            
-            return content
+            return _clean_text(content, doc_type)
             
         except Exception as e:
             self.logger.error(f"Error cleaning content: {str(e)}")
-            raise
-
-    async def _create_chunks(self, content: str) -> List[str]:
-        """Split content into overlapping chunks."""
-        try:
-            sentences = nltk.sent_tokenize(content)
-            chunks = []
-            current_chunk = []
-            current_size = 0
-            
-            for sentence in sentences:
-                sentence_size = len(sentence.split())
-                
-                if current_size + sentence_size > self.chunk_size:
-                    # Save current chunk
-                    if current_chunk:
-                        chunks.append(' '.join(current_chunk))
-                    
-                    # Start new chunk with overlap
-                    overlap_start = max(0, len(current_chunk) - self.chunk_overlap)
-                    current_chunk = current_chunk[overlap_start:] + [sentence]
-                    current_size = sum(len(s.split()) for s in current_chunk)
-                else:
-                    current_chunk.append(sentence)
-                    current_size += sentence_size
-            
-            # Add final chunk
-            if current_chunk:
-                chunks.append(' '.join(current_chunk))
-            
-            return chunks
-            
-        except Exception as e:
-            self.logger.error(f"Error creating chunks: {str(e)}")
-            raise
-
-    def _process_chunks(self, chunks: List[str], metadata: Dict[str, Any]) -> List[ProcessedChunk]:
-        """Process chunks in parallel."""
-        try:
-            processed_chunks = []
-            
-            for chunk in chunks:
-                # Calculate chunk hash
-                chunk_hash = hashlib.sha256(chunk.encode()).hexdigest()
-                
-                # Calculate quality score
-                quality_score = self._calculate_quality_score(chunk)
-                
-                # Update chunk metadata
-                chunk_metadata = metadata.copy()
-                chunk_metadata.update({
-                    'chunk_hash': chunk_hash,
-                    'chunk_size': len(chunk.split()),
-                    'quality_score': quality_score
-                })
-                
-                processed_chunks.append(ProcessedChunk(
-                    content=chunk,
-                    metadata=chunk_metadata,
-                    hash=chunk_hash,
-                    quality_score=quality_score
-                ))
-            
-            return processed_chunks
-            
-        except Exception as e:
-            self.logger.error(f"Error processing chunks: {str(e)}")
-            raise
-
-    def _calculate_quality_score(self, chunk: str) -> float:
-        """Calculate a quality score for the chunk."""
-        try:
-            # Factors for quality score
-            factors = {
-                'length': 0.3,  # Optimal length
-                'coherence': 0.3,  # Sentence coherence
-                'info_density': 0.4  # Information density
-            }
-            
-            scores = {}
-            
-            # Length score
-            chunk_length = len(chunk.split())
-            scores['length'] = min(chunk_length / self.chunk_size, 1.0)
-            
-            # Coherence score
-            sentences = nltk.sent_tokenize(chunk)
-            scores['coherence'] = min(len(sentences) / 5, 1.0)
-            
-            # Information density score
-            pos_tags = nltk.pos_tag(nltk.word_tokenize(chunk))
-            content_words = len([word for word, pos in pos_tags if pos.startswith(('NN', 'VB', 'JJ', 'RB'))])
-            scores['info_density'] = content_words / max(chunk_length, 1)
-            
-            # Calculate weighted score
-            total_score = sum(score * weight for (metric, score), (_, weight) 
-                            in zip(scores.items(), factors.items()))
-            
-            return round(total_score, 3)
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating quality score: {str(e)}")
-            return 0.0
\ No newline at end of file
+            raise
\ No newline at end of file
@@ -1,16 +1,19 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import httpx
+import orjson
 import chromadb
 from typing import List, Optional
 import os
 import logging
+import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="RAG System API")
+app = FastAPI(title="RAG System API", default_response_class=ORJSONResponse)
 
 # Initialize ChromaDB client
 chroma_client = chromadb.HttpClient(host=os.getenv("CHROMA_HOST", "chroma"), port=8000)
@@ -24,17 +27,21 @@ class Document(BaseModel):
     content: str
     metadata: dict
 
+def retrieve_context(query: Query) -> str:
+    """Join the documents most relevant to a query into a context string."""
+    # Get relevant documents from ChromaDB
+    results = collection.query(
+        query_texts=[query.text],
+        n_results=query.context_size
+    )
+    
+    # Prepare context from retrieved documents
+    return "\n".join([doc for doc in results['documents'][0]])
+
 @app.post("/query")
 async def query_documents(query: Query):
     try:
-        # Get relevant documents from ChromaDB
-        results = collection.query(
-            query_texts=[query.text],
-            n_results=query.context_size
-        )
-        
-        # Prepare context from retrieved documents
-        context = "\n".join([doc for doc in results['documents'][0]])
+        context = retrieve_context(query)
         
         # Query the DeepSeek model
         async with httpx.AsyncClient() as client:
@@ -55,6 +62,39 @@ async def query_documents(query: Query):
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query_stream")
+async def query_documents_stream(query: Query):
+    try:
+        context = retrieve_context(query)
+        
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def relay():
+        # Pass the model's server-sent events through unchanged
+        try:
+            async with httpx.AsyncClient(timeout=None) as client:
+                async with client.stream(
+                    "POST",
+                    f"{os.getenv('MODEL_SERVICE_URL')}/generate_stream",
+                    json={
+                        "prompt": query.text,
+                        "context": context
+                    }
+                ) as response:
+                    if response.status_code != 200:
+                        yield 'data: {"error": "Model service error"}\n\ndata: [DONE]\n\n'
+                        return
+                    async for chunk in response.aiter_raw():
+                        yield chunk
+        except httpx.HTTPError as e:
+            # The 200 is already sent, so report the failure in-stream
+            logger.error(f"Error relaying stream: {str(e)}")
+            yield f"\n\ndata: {orjson.dumps({'error': str(e) or 'Model service error'}).decode()}\n\ndata: [DONE]\n\n"
+
+    return StreamingResponse(relay(), media_type="text/event-stream")
+
 @app.post("/documents")
 async def add_document(document: Document):
     try:
@@ -62,7 +102,7 @@ async def add_document(document: Document):
         collection.add(
             documents=[document.content],
             metadatas=[document.metadata],
-            ids=[f"doc_{len(collection.get()['ids']) + 1}"]
+            ids=[uuid.uuid4().hex]
         )
         return {"status": "success"}
         
@@ -2,21 +2,123 @@ import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterable, Mapping
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import functools
+from collections import defaultdict
+import orjson
 import logging
-from dataclasses import dataclass
-from cachetools import TTLCache, LRUCache
+import uuid
+from dataclasses import dataclass, replace
+from cachetools import Cache, TTLCache, LRUCache
+import xxhash
+from src.runtime.pools import io_pool, run_in_pool
 
 @dataclass
 class DocumentChunk:
     content: str
-    metadata: Dict[str, Any]
+    metadata: Mapping[str, Any]
     embedding: Optional[np.ndarray] = None
+    id: Optional[str] = None
+
+class EmbeddingSlabCache(TTLCache):
+    """TTL cache that stores embeddings as int8 rows of one preallocated slab.
+    
+    Each row is quantized symmetrically with its own float32 scale, which
+    keeps the cache at a quarter of the float32 size with negligible effect
+    on cosine similarity. Cached values are row indices; rows of evicted or
+    expired entries are reused, so steady-state caching does not allocate.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.slab: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        # One spare row: a new entry is written before its insert evicts another
+        self._free = list(range(maxsize, -1, -1))
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Embedding dimension, known once the first embedding is cached."""
+        return None if self.slab is None else self.slab.shape[1]
+
+    def get_embedding(self, key: str, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Dequantize a cached embedding into out (or a new array); None on a miss."""
+        slot = self.get(key)
+        if slot is None:
+            return None
+        if out is None:
+            out = np.empty(self.dim, dtype=np.float32)
+        return np.multiply(self.slab[slot], self.scales[slot], out=out)
+
+    def put_embedding(self, key: str, embedding: np.ndarray):
+        """Quantize an embedding into a free slab row and cache it."""
+        if self.slab is None:
+            self.slab = np.empty((self.maxsize + 1, len(embedding)), dtype=np.int8)
+            self.scales = np.empty(self.maxsize + 1, dtype=np.float32)
+        if key in self:
+            del self[key]
+        
+        scale = float(np.max(np.abs(embedding))) / 127 or 1.0
+        slot = self._free.pop()
+        self.slab[slot] = np.rint(embedding / scale)
+        self.scales[slot] = scale
+        self[key] = slot
+
+    def __delitem__(self, key):
+        slot = Cache.__getitem__(self, key)
+        super().__delitem__(key)
+        self._free.append(slot)
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self._free.extend(slot for _, slot in expired)
+        return expired
+
+class QueryResultCache(LRUCache):
+    """LRU cache of query results with a reverse index from document id to keys.
+    
+    Lets a deletion invalidate only the cached results that contain one of
+    the deleted documents.
+    """
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self._keys_by_id: Dict[str, Set[Any]] = defaultdict(set)
+
+    def __setitem__(self, key, value):
+        if key in self:
+            del self[key]
+        super().__setitem__(key, value)
+        for doc_id in value["ids"]:
+            self._keys_by_id[doc_id].add(key)
+
+    def __delitem__(self, key):
+        value = Cache.__getitem__(self, key)
+        super().__delitem__(key)
+        for doc_id in value["ids"]:
+            keys = self._keys_by_id.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_id[doc_id]
+
+    def invalidate(self, ids: Iterable[str]) -> int:
+        """Drop cached results containing any of the given document ids."""
+        keys = set()
+        for doc_id in ids:
+            keys.update(self._keys_by_id.get(doc_id, ()))
+        for key in keys:
+            self.pop(key, None)
+        return len(keys)
 
 class OptimizedChromaDB:
-    def __init__(self, host: str, port: int, collection_name: str):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        collection_name: str,
+        max_batch: int = 256,
+        max_wait: float = 0.05
+    ):
         self.settings = Settings(
             chroma_api_impl="rest",
             chroma_server_host=host,
@@ -29,11 +131,24 @@ class OptimizedChromaDB:
         self.collection = self._get_or_create_collection()
         
         # Caches
-        self.embedding_cache = TTLCache(maxsize=1000, ttl=3600)  # 1 hour TTL
-        self.query_cache = LRUCache(maxsize=100)
+        self.embedding_cache = EmbeddingSlabCache(maxsize=1000, ttl=3600)  # 1 hour TTL
+        self.query_cache = QueryResultCache(maxsize=100)
         
-        # Thread pool for parallel processing
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        # Shared I/O pool: the embedding function lives on the collection
+        # and the HTTP client is blocking, so both stay on threads
+        self.executor = io_pool
+        
+        # Write batching: concurrent add_documents calls are coalesced into
+        # batches of up to max_batch documents, flushed at least every max_wait seconds
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # A dequeued slice that did not fit the previous batch
+        self._carry: Optional[Tuple[List[DocumentChunk], asyncio.Future]] = None
+        
+        # Reused output buffer for generated embeddings, sized on first use
+        self._emb_scratch: Optional[np.ndarray] = None
         
         self.logger = logging.getLogger(__name__)
 
@@ -46,53 +161,219 @@ class OptimizedChromaDB:
                 metadata={"hnsw:space": "cosine"}  # Optimized for semantic search
             )
 
-    async def add_documents(self, documents: List[DocumentChunk], batch_size: int = 100):
-        """Add documents to ChromaDB with batching and parallel processing."""
+    async def add_documents(self, documents: List[DocumentChunk], batch_size: int = 100) -> List[str]:
+        """Add documents to ChromaDB through the shared write batcher.
+        
+        Returns the ids of the written documents, in input order, once all
+        documents of this call have been written. Chunks without an id get
+        a random one.
+        """
         try:
+            self._ensure_writer()
+            loop = asyncio.get_event_loop()
+            
+            futures = []
             for i in range(0, len(documents), batch_size):
-                batch = documents[i:i + batch_size]
-                
-                # Parallel embedding generation
-                embedding_tasks = []
-                for doc in batch:
-                    if doc.content in self.embedding_cache:
-                        doc.embedding = self.embedding_cache[doc.content]
-                    else:
-                        embedding_tasks.append(doc)
-                
-                if embedding_tasks:
-                    # Process embeddings in parallel
-                    loop = asyncio.get_event_loop()
-                    embeddings = await loop.run_in_executor(
-                        self.executor,
-                        self._batch_generate_embeddings,
-                        embedding_tasks
-                    )
-                    
-                    # Update cache
-                    for doc, embedding in zip(embedding_tasks, embeddings):
-                        self.embedding_cache[doc.content] = embedding
-                        doc.embedding = embedding
+                future = loop.create_future()
+                await self._write_queue.put((documents[i:i + batch_size], future))
+                futures.append(future)
+            
+            results = await asyncio.gather(*futures)
+            return [doc_id for ids in results for doc_id in ids]
                 
-                # Prepare batch data
-                ids = [f"doc_{i}" for i in range(len(batch))]
-                embeddings = [doc.embedding for doc in batch]
-                metadatas = [doc.metadata for doc in batch]
-                documents = [doc.content for doc in batch]
+        except Exception as e:
+            self.logger.error(f"Error adding documents: {str(e)}")
+            raise
+
+    def _ensure_writer(self):
+        """Start the background write batcher if it is not running."""
+        if self._write_queue is None:
+            self._write_queue = asyncio.Queue()
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._batch_writer())
+
+    async def _next_batch(self) -> List[Tuple[List[DocumentChunk], asyncio.Future]]:
+        """Wait for queued documents and coalesce them into one batch.
+        
+        Batches hold up to max_batch documents; a single larger slice is
+        written as a batch of its own.
+        """
+        loop = asyncio.get_event_loop()
+        if self._carry is not None:
+            items = [self._carry]
+            self._carry = None
+        else:
+            items = [await self._write_queue.get()]
+        size = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        
+        try:
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._write_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(item[0]) > self.max_batch:
+                    # Leave it for the next batch rather than overshoot max_batch
+                    self._carry = item
+                    break
+                items.append(item)
+                size += len(item[0])
+        except asyncio.CancelledError:
+            # Already dequeued, so close() cannot drain these; fail them here
+            for _, future in items:
+                future.cancel()
+            raise
+        
+        return items
+
+    async def _batch_writer(self):
+        """Embed batch N+1 while batch N is being written to ChromaDB."""
+        pending_write = None
+        
+        while True:
+            items = await self._next_batch()
+            batch = [doc for docs, _ in items for doc in docs]
+            futures = [future for _, future in items]
+            
+            try:
+                embeddings = await self._embed_batch(batch)
                 
-                # Add to ChromaDB
-                self.collection.add(
+                # Keep at most one write in flight so batches land in order
+                if pending_write is not None:
+                    await pending_write
+            except asyncio.CancelledError:
+                for future in futures:
+                    future.cancel()
+                raise
+            except Exception as e:
+                self.logger.error(f"Error embedding batch: {str(e)}")
+                self._resolve(futures, e)
+                continue
+            
+            pending_write = asyncio.create_task(self._write_batch(batch, embeddings, items))
+
+    async def _embed_batch(self, batch: List[DocumentChunk]) -> np.ndarray:
+        """Build the (N, d) embedding matrix for a batch, using the embedding cache."""
+        dim = self.embedding_cache.dim
+        embeddings = np.empty((len(batch), dim), dtype=np.float32) if dim else None
+        missing = []
+        
+        # Dequantize cache hits straight into the batch matrix
+        for i, doc in enumerate(batch):
+            if embeddings is None or self.embedding_cache.get_embedding(doc.content, out=embeddings[i]) is None:
+                missing.append(i)
+        
+        if missing:
+            # Embed each distinct content once; duplicates reuse its row
+            unique: Dict[str, int] = {}
+            unique_docs = []
+            rows = []
+            for i in missing:
+                content = batch[i].content
+                if content not in unique:
+                    unique[content] = len(unique_docs)
+                    unique_docs.append(batch[i])
+                rows.append(unique[content])
+            
+            # Process embeddings in parallel
+            generated = await run_in_pool(
+                self.executor,
+                self._batch_generate_embeddings,
+                unique_docs
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(batch), generated.shape[1]), dtype=np.float32)
+            embeddings[missing] = generated[rows]
+            
+            # Update cache
+            for content, embedding in zip(unique, generated):
+                self.embedding_cache.put_embedding(content, embedding)
+        
+        for doc, embedding in zip(batch, embeddings):
+            doc.embedding = embedding
+        
+        return embeddings
+
+    async def _write_batch(
+        self,
+        batch: List[DocumentChunk],
+        embeddings: np.ndarray,
+        items: List[Tuple[List[DocumentChunk], asyncio.Future]]
+    ):
+        """Write an embedded batch to ChromaDB and resolve each waiter with its ids."""
+        futures = [future for _, future in items]
+        try:
+            # Prepare batch data in a single pass
+            n = len(batch)
+            ids = [None] * n
+            metadatas = [None] * n
+            documents = [None] * n
+            for i, doc in enumerate(batch):
+                ids[i] = doc.id or uuid.uuid4().hex
+                # Chroma validates metadata as a plain dict; layered views are merged here
+                metadatas[i] = doc.metadata if isinstance(doc.metadata, dict) else dict(doc.metadata)
+                documents[i] = doc.content
+            
+            # Add to ChromaDB without blocking the event loop
+            await run_in_pool(
+                self.executor,
+                functools.partial(
+                    self.collection.add,
                     embeddings=embeddings,
                     documents=documents,
                     metadatas=metadatas,
                     ids=ids
                 )
-                
-                self.logger.info(f"Added batch of {len(batch)} documents")
-                
+            )
+            
+            self.logger.info(f"Added batch of {len(batch)} documents")
+            # Hand each caller the ids of its own slice of the batch
+            results = []
+            start = 0
+            for docs, _ in items:
+                results.append(ids[start:start + len(docs)])
+                start += len(docs)
+            self._resolve(futures, results=results)
+            
         except Exception as e:
-            self.logger.error(f"Error adding documents: {str(e)}")
-            raise
+            self.logger.error(f"Error writing batch: {str(e)}")
+            self._resolve(futures, e)
+
+    @staticmethod
+    def _resolve(
+        futures: List[asyncio.Future],
+        error: Optional[Exception] = None,
+        results: Optional[List[List[str]]] = None
+    ):
+        """Complete the waiters of a batch, skipping cancelled callers."""
+        for i, future in enumerate(futures):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(results[i] if results is not None else None)
+            else:
+                future.set_exception(error)
+
+    async def close(self):
+        """Stop the background write batcher and cancel queued writes."""
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        
+        if self._carry is not None:
+            self._carry[1].cancel()
+            self._carry = None
+        while self._write_queue is not None and not self._write_queue.empty():
+            _, future = self._write_queue.get_nowait()
+            future.cancel()
 
     async def query_documents(
         self,
@@ -101,7 +382,7 @@ class OptimizedChromaDB:
         metadata_filter: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Query documents with caching and metadata filtering."""
-        cache_key = f"{query_text}_{n_results}_{str(metadata_filter)}"
+        cache_key = self._query_cache_key(query_text, n_results, metadata_filter)
         
         # Check cache
         if cache_key in self.query_cache:
@@ -121,6 +402,7 @@ class OptimizedChromaDB:
             
             # Process results
             processed_results = {
+                "ids": results["ids"][0],
                 "documents": results["documents"][0],
                 "metadatas": results["metadatas"][0],
                 "distances": results["distances"][0]
@@ -135,12 +417,38 @@ class OptimizedChromaDB:
             self.logger.error(f"Error querying documents: {str(e)}")
             raise
 
-    def _batch_generate_embeddings(self, documents: List[DocumentChunk]) -> List[np.ndarray]:
-        """Generate embeddings for a batch of documents."""
+    @staticmethod
+    def _query_cache_key(
+        query_text: str,
+        n_results: int,
+        metadata_filter: Optional[Dict[str, Any]]
+    ) -> int:
+        """Hash a query into a short key that does not depend on filter key order."""
+        canonical = orjson.dumps(
+            {"q": query_text, "n": n_results, "f": metadata_filter},
+            option=orjson.OPT_SORT_KEYS,
+            default=str
+        )
+        return xxhash.xxh3_64_intdigest(canonical)
+
+    def _batch_generate_embeddings(self, documents: List[DocumentChunk]) -> np.ndarray:
+        """Generate embeddings for a batch of documents.
+        
+        Returns a view into a reused scratch buffer, valid until the next call.
+        """
         try:
             texts = [doc.content for doc in documents]
             embeddings = self.collection._embedding_function(texts)
-            return embeddings
+            
+            n, dim = len(embeddings), len(embeddings[0])
+            scratch = self._emb_scratch
+            if scratch is None or scratch.shape[0] < n or scratch.shape[1] != dim:
+                scratch = self._emb_scratch = np.empty((max(n, self.max_batch), dim), dtype=np.float32)
+            
+            out = scratch[:n]
+            for i, embedding in enumerate(embeddings):
+                out[i] = embedding
+            return out
         except Exception as e:
             self.logger.error(f"Error generating embeddings: {str(e)}")
             raise
@@ -150,23 +458,26 @@ class OptimizedChromaDB:
         try:
             self.collection.delete(ids=ids)
             
-            # Clear relevant cache entries
-            self.query_cache.clear()  # Clear query cache as results might change
+            # Invalidate only cached results that contain a deleted document
+            invalidated = self.query_cache.invalidate(ids)
             
-            self.logger.info(f"Deleted {len(ids)} documents")
+            self.logger.info(f"Deleted {len(ids)} documents, invalidated {invalidated} cached queries")
             
         except Exception as e:
             self.logger.error(f"Error deleting documents: {str(e)}")
             raise
 
     async def update_documents(self, documents: List[DocumentChunk], ids: List[str]):
-        """Update existing documents."""
+        """Update existing documents, keeping their ids."""
         try:
+            if len(documents) != len(ids):
+                raise ValueError("documents and ids must have the same length")
+            
             # Delete old documents
             await self.delete_documents(ids)
             
-            # Add new documents
-            await self.add_documents(documents)
+            # Re-add under the same ids
+            await self.add_documents([replace(doc, id=doc_id) for doc, doc_id in zip(documents, ids)])
             
         except Exception as e:
             self.logger.error(f"Error updating documents: {str(e)}")
@@ -2,10 +2,12 @@ from typing import Optional, Dict, Any, Callable
 import functools
 import asyncio
 import logging
+import os
+import random
 import traceback
 from datetime import datetime
 from dataclasses import dataclass
-import json
+import orjson
 
 @dataclass
 class ErrorContext:
@@ -15,11 +17,22 @@ class ErrorContext:
     trace: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
+# Default number of concurrent retry back-offs per error type
+DEFAULT_RETRY_CONCURRENCY = max(1, (os.cpu_count() or 1) // 2)
+
+def _serialize(value: Any) -> str:
+    """Serialize call arguments for an error context, falling back to repr."""
+    try:
+        return orjson.dumps(value, default=repr).decode()
+    except orjson.JSONEncodeError:
+        return repr(value)
+
 class ErrorHandler:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.error_handlers: Dict[str, Callable] = {}
         self.recovery_strategies: Dict[str, Callable] = {}
+        self.retry_limits: Dict[str, asyncio.Semaphore] = {}
         
     def register_handler(self, error_type: str, handler: Callable):
         """Register an error handler for a specific error type."""
@@ -29,6 +42,16 @@ class ErrorHandler:
         """Register a recovery strategy for a specific error type."""
         self.recovery_strategies[error_type] = strategy
 
+    def register_retry_limit(self, error_type: str, limit: int):
+        """Limit how many retries of a specific error type back off concurrently."""
+        self.retry_limits[error_type] = asyncio.Semaphore(limit)
+
+    def retry_semaphore(self, error_type: str) -> asyncio.Semaphore:
+        """Get the retry semaphore for an error type, creating a default one."""
+        if error_type not in self.retry_limits:
+            self.register_retry_limit(error_type, DEFAULT_RETRY_CONCURRENCY)
+        return self.retry_limits[error_type]
+
 def with_error_handling(max_retries: int = 3, retry_delay: float = 1.0):
     """Decorator for error handling and automatic retry."""
     def decorator(func):
@@ -51,15 +74,15 @@ def with_error_handling(max_retries: int = 3, retry_delay: float = 1.0):
                         trace=traceback.format_exc(),
                         metadata={
                             'function': func.__name__,
-                            'args': str(args),
-                            'kwargs': str(kwargs),
+                            'args': _serialize(args),
+                            'kwargs': _serialize(kwargs),
                             'retry_count': retries
                         }
                     )
                     
                     # Log error
                     logging.error(f"Error in {func.__name__}: {str(e)}")
-                    logging.debug(f"Error context: {error_context}")
+                    logging.debug(f"Error context: {orjson.dumps(error_context).decode()}")
                     
                     # Apply recovery strategy if available
                     handler = error_handler.error_handlers.get(type(e).__name__)
@@ -70,7 +93,11 @@ def with_error_handling(max_retries: int = 3, retry_delay: float = 1.0):
                             logging.error(f"Recovery failed: {str(recovery_error)}")
                     
                     if retries < max_retries:
-                        await asyncio.sleep(retry_delay * (2 ** (retries - 1)))  # Exponential backoff
+                        # Exponential backoff with jitter, so callers failing on the
+                        # same dependency do not retry in lockstep
+                        delay = random.uniform(retry_delay, retry_delay * 3 * (2 ** (retries - 1)))
+                        async with error_handler.retry_semaphore(type(e).__name__):
+                            await asyncio.sleep(delay)
                     
             # All retries failed
             raise last_error
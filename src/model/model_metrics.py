@@ -1,8 +1,13 @@
 from prometheus_client import Counter, Histogram, Gauge
 import time
+import logging
+import psutil
+import torch
 from functools import wraps
 from typing import Optional, Dict, Any
 
+logger = logging.getLogger(__name__)
+
 # Metriken definieren
 REQUESTS_TOTAL = Counter(
     'model_requests_total',
@@ -76,6 +81,10 @@ class ModelMetricsCollector:
     def __init__(self):
         self.last_collection = 0
         self.collection_interval = 15  # seconds
+        
+        # Cached once: Process() opens /proc handles, and CUDA availability does not change
+        self._process = psutil.Process()
+        self._cuda_available = torch.cuda.is_available()
 
     def collect_metrics(self):
         current_time = time.time()
@@ -84,14 +93,10 @@ class ModelMetricsCollector:
         
         try:
             # Memory metrics
-            import psutil
-            process = psutil.Process()
-            memory_info = process.memory_info()
-            MEMORY_USAGE.set(memory_info.rss)
+            MEMORY_USAGE.set(self._process.memory_info().rss)
             
             # GPU metrics
-            import torch
-            if torch.cuda.is_available():
+            if self._cuda_available:
                 gpu_memory = torch.cuda.memory_allocated()
                 GPU_MEMORY_USAGE.set(gpu_memory)
                 
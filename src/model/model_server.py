@@ -1,10 +1,19 @@
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer, TorchAoConfig
+from transformers import StoppingCriteria, StoppingCriteriaList
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import os
+import asyncio
+import base64
 import logging
-from typing import List, Optional
+import threading
+import orjson
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Literal, Optional, Tuple
 import numpy as np
 
 # Configure logging
@@ -12,33 +21,68 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
-app = FastAPI(title="DeepSeek-R1 Model Server")
+app = FastAPI(title="DeepSeek-R1 Model Server", default_response_class=ORJSONResponse)
 
 # Model configuration
 MODEL_PATH = os.getenv("MODEL_PATH", "/models/deepseek-r1")
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 MAX_LENGTH = int(os.getenv("MODEL_MAX_LENGTH", "2048"))
 TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", "0.7"))
+USE_TORCH_COMPILE = os.getenv("USE_TORCH_COMPILE", "false").lower() == "true"
+MODEL_QUANTIZATION = os.getenv("MODEL_QUANTIZATION", "int8").lower()
+
+# Dynamic batching: requests arriving within the window share one generate call
+MAX_BATCH = int(os.getenv("MODEL_MAX_BATCH", "32"))
+TOKENIZE_CACHE_SIZE = int(os.getenv("MODEL_TOKENIZE_CACHE_SIZE", "2048"))
+BATCH_WINDOW = float(os.getenv("MODEL_BATCH_WINDOW_MS", "5")) / 1000
+
+# Compiled /embed pads inputs to these shapes so only a bounded set of graphs is recorded
+EMBED_BATCH_BUCKETS = sorted(int(b) for b in os.getenv("EMBED_BATCH_BUCKETS", "1,8,32").split(","))
+EMBED_LENGTH_MULTIPLE = int(os.getenv("EMBED_LENGTH_MULTIPLE", "32"))
 
 class GenerateRequest(BaseModel):
     prompt: str
     context: Optional[str] = None
-    max_length: Optional[int] = MAX_LENGTH
-    temperature: Optional[float] = TEMPERATURE
+    max_length: int = Field(MAX_LENGTH, gt=0, le=MAX_LENGTH)
+    temperature: float = Field(TEMPERATURE, gt=0)
+
+class BatchGenerateRequest(BaseModel):
+    prompts: List[str]
+    context: Optional[str] = None
+    max_length: int = Field(MAX_LENGTH, gt=0, le=MAX_LENGTH)
+    temperature: float = Field(TEMPERATURE, gt=0)
 
 class EmbeddingRequest(BaseModel):
     texts: List[str]
 
+def quantization_config() -> Optional[TorchAoConfig]:
+    """Build the torchao weight-only quantization config for MODEL_QUANTIZATION."""
+    if MODEL_QUANTIZATION == "int8":
+        return TorchAoConfig("int8_weight_only")
+    if MODEL_QUANTIZATION == "int4":
+        return TorchAoConfig("int4_weight_only", group_size=128)
+    if MODEL_QUANTIZATION == "none":
+        return None
+    raise ValueError(f"Unsupported MODEL_QUANTIZATION: {MODEL_QUANTIZATION}")
+
 def load_model():
     """Load the DeepSeek-R1 model and tokenizer."""
     try:
         tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
+        # Batched generation needs left padding so new tokens follow each prompt
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
         model = AutoModelForCausalLM.from_pretrained(
             MODEL_PATH,
             torch_dtype=torch.float16,
             device_map="auto",
-            load_in_8bit=True  # Quantization for memory efficiency
+            quantization_config=quantization_config()  # Quantization for memory efficiency
         )
+        if USE_TORCH_COMPILE:
+            # A fixed-size KV cache keeps decode shapes static for the compiled graph
+            model.generation_config.cache_implementation = "static"
+            model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=False)
         return model, tokenizer
     except Exception as e:
         logger.error(f"Error loading model: {str(e)}")
@@ -48,36 +92,318 @@ def load_model():
 model = None
 tokenizer = None
 
+# Pending generate requests: (input_ids, max_new_tokens, temperature, future),
+# created on startup so it belongs to the serving event loop
+request_queue: Optional["asyncio.Queue[Tuple[List[int], int, float, asyncio.Future]]"] = None
+batcher_task = None
+
+# All tokenizer and model work runs on this single thread: the fast tokenizer
+# raises "Already borrowed" when used from two threads at once, and generate
+# calls share the model's KV cache
+model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+
+async def run_on_model_thread(func, *args):
+    """Run a tokenizer or model call on the model thread."""
+    return await asyncio.get_running_loop().run_in_executor(model_executor, func, *args)
+
+# Token ids of the special prefix and the fixed prompt template pieces, filled on startup
+template_ids: Dict[str, Tuple[int, ...]] = {}
+
+def pretokenize_template():
+    """Tokenize the special prefix and the fixed template pieces once."""
+    template_ids["special"] = tuple(tokenizer("")["input_ids"])
+    template_ids["context"] = tuple(tokenizer("Context:", add_special_tokens=False)["input_ids"])
+    template_ids["question"] = tuple(tokenizer("\n\nQuestion:", add_special_tokens=False)["input_ids"])
+    template_ids["answer"] = tuple(tokenizer("\n\nAnswer:", add_special_tokens=False)["input_ids"])
+
+@lru_cache(maxsize=TOKENIZE_CACHE_SIZE)
+def tokenize_cached(text: str) -> Tuple[int, ...]:
+    """Tokenize text without special tokens; repeated texts reuse the cached ids."""
+    return tuple(tokenizer(
+        text,
+        add_special_tokens=False,
+        truncation=True,
+        max_length=MAX_LENGTH
+    )["input_ids"])
+
+def encode_input(prompt: str, context: Optional[str]) -> List[int]:
+    """Build the input ids for a prompt, splicing in the pre-tokenized template."""
+    room = MAX_LENGTH - len(template_ids["special"])
+    if not context:
+        return [*template_ids["special"], *tokenize_cached(prompt)[:room]]
+    
+    # Leading spaces keep the word-boundary tokens of the full template text
+    prompt_ids = tokenize_cached(" " + prompt)
+    fixed = len(template_ids["context"]) + len(template_ids["question"]) + len(template_ids["answer"])
+    
+    # Truncate the context rather than the question when the input is too long
+    context_ids = tokenize_cached(" " + context)[:max(0, room - fixed - len(prompt_ids))]
+    
+    ids = [
+        *template_ids["context"],
+        *context_ids,
+        *template_ids["question"],
+        *prompt_ids,
+        *template_ids["answer"]
+    ]
+    return [*template_ids["special"], *ids[:room]]
+
+# Pinned host and device buffers for generate inputs, allocated on startup on GPU.
+# Only the batcher uses them and it runs one batch at a time.
+input_buffers: Dict[str, Tuple[torch.Tensor, torch.Tensor]] = {}
+
+def allocate_input_buffers():
+    """Allocate flat staging buffers large enough for a full batch."""
+    for name in ("input_ids", "attention_mask"):
+        host = torch.empty(MAX_BATCH * MAX_LENGTH, dtype=torch.long, pin_memory=True)
+        input_buffers[name] = (host, torch.empty_like(host, device=DEVICE))
+
+def stage_inputs(batch: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+    """Move a padded CPU batch to the device through the staging buffers."""
+    if not input_buffers:
+        return {name: tensor.to(DEVICE) for name, tensor in batch.items()}
+    
+    staged = {}
+    for name, (host, device) in input_buffers.items():
+        tensor = batch[name]
+        size = tensor.numel()
+        # Flat slices viewed as (B, L) stay contiguous for the async copy
+        host[:size].view(tensor.shape).copy_(tensor)
+        staged[name] = device[:size].view(tensor.shape)
+        staged[name].copy_(host[:size].view(tensor.shape), non_blocking=True)
+    return staged
+
+def encode_request(prompt: str, context: Optional[str], max_length: int) -> Tuple[List[int], int]:
+    """Encode a prompt and work out its generation budget.
+    
+    max_length counts prompt tokens, so each prompt gets its own budget.
+    """
+    input_ids = encode_input(prompt, context)
+    return input_ids, max(1, max_length - len(input_ids))
+
+def generate_batch(
+    input_ids: List[List[int]],
+    budgets: List[int],
+    temperature: float
+) -> List[str]:
+    """Generate responses for a batch of encoded prompts with one padded generate call."""
+    batch = tokenizer.pad(
+        [{"input_ids": ids} for ids in input_ids],
+        padding=True,
+        return_tensors="pt"
+    )
+    prompt_length = batch["input_ids"].shape[1]
+    
+    inputs = stage_inputs(batch)
+    with torch.inference_mode():
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max(budgets),
+            temperature=temperature,
+            do_sample=True,
+            pad_token_id=tokenizer.pad_token_id
+        )
+    
+    return [
+        tokenizer.decode(output[:prompt_length + budget], skip_special_tokens=True)
+        for output, budget in zip(outputs, budgets)
+    ]
+
+class StopOnEvent(StoppingCriteria):
+    """Stop generation once an event is set, e.g. when a streaming client disconnects."""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+def stream_generate(
+    input_ids: List[int],
+    max_new_tokens: int,
+    temperature: float,
+    streamer: TextIteratorStreamer,
+    errors: List[Exception],
+    cancelled: threading.Event
+):
+    """Generate for a single prompt, pushing decoded text into a streamer."""
+    if cancelled.is_set():
+        # The client left while this request was queued behind other model work
+        streamer.end()
+        return
+    try:
+        input_tensor = torch.tensor([input_ids], dtype=torch.long, device=DEVICE)
+        with torch.inference_mode():
+            model.generate(
+                input_ids=input_tensor,
+                attention_mask=torch.ones_like(input_tensor),
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                do_sample=True,
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([StopOnEvent(cancelled)])
+            )
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        errors.append(e)
+        # Unblock the reader
+        streamer.end()
+
+async def run_batch(
+    batch: List[Tuple[List[int], int, float, asyncio.Future]],
+    temperature: float
+):
+    """Run a batch on the model thread and resolve its futures."""
+    try:
+        responses = await run_on_model_thread(
+            generate_batch,
+            [item[0] for item in batch],
+            [item[1] for item in batch],
+            temperature
+        )
+        for item, response in zip(batch, responses):
+            if not item[3].done():
+                item[3].set_result(response)
+    except Exception as e:
+        logger.error(f"Error generating batch: {str(e)}")
+        for item in batch:
+            if not item[3].done():
+                item[3].set_exception(e)
+
+async def batcher_loop():
+    """Drain queued generate requests into batches of up to MAX_BATCH."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await request_queue.get()]
+        deadline = loop.time() + BATCH_WINDOW
+        
+        # Collect more requests until the batch is full or the window closes
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(request_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        # Temperature applies to the whole generate call and every prompt decodes
+        # for the largest budget, so group by temperature and budgets within 2x
+        groups = defaultdict(list)
+        for item in batch:
+            groups[(item[2], item[1].bit_length())].append(item)
+        for (temperature, _), items in groups.items():
+            await run_batch(items, temperature)
+
+def warmup_model():
+    """Run a few short generate and embed calls so torch.compile traces before serving."""
+    input_ids = torch.full((1, 8), tokenizer.pad_token_id, dtype=torch.long, device=DEVICE)
+    attention_mask = torch.ones_like(input_ids)
+    with torch.inference_mode():
+        for _ in range(2):
+            model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=2,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id
+            )
+    
+    # Trace the pool on the smallest embedding bucket
+    input_ids = torch.full((EMBED_BATCH_BUCKETS[0], EMBED_LENGTH_MULTIPLE), tokenizer.pad_token_id, dtype=torch.long, device=DEVICE)
+    attention_mask = torch.ones_like(input_ids)
+    with torch.inference_mode():
+        for _ in range(2):
+            embed_pool(input_ids, attention_mask, attention_mask.cumsum(-1) - 1)
+
+def disable_compile():
+    """Fall back to the eager forward and pooling after a failed compile."""
+    global embed_pool
+    # The compiled forward is an instance attribute over the class method
+    model.__dict__.pop("forward", None)
+    model.generation_config.cache_implementation = None
+    embed_pool = mean_pool
+    torch._dynamo.reset()
+
+def mean_pool(
+    input_ids: torch.Tensor,
+    attention_mask: torch.Tensor,
+    position_ids: torch.Tensor
+) -> torch.Tensor:
+    """Mean-pool the last hidden state over the non-padding tokens."""
+    # The base model skips the LM head; its output is the last hidden state
+    last_hidden_state = model.base_model(
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        position_ids=position_ids
+    ).last_hidden_state
+    
+    # Token counts come from the integer mask; folding 1/length into the weights
+    # keeps the fused weighted sum within fp16 range on long sequences
+    lengths = attention_mask.sum(dim=1, keepdim=True).clamp(min=1)
+    weights = (attention_mask / lengths).to(dtype=last_hidden_state.dtype)
+    return torch.einsum("bsh,bs->bh", last_hidden_state, weights)
+
+# On GPU, reduce-overhead records CUDA graphs for the compiled pooled forward.
+# Host syncs in the model (e.g. the SDPA mask check) become graph breaks and
+# run eagerly, where a manual torch.cuda.graph capture would fail outright.
+embed_pool = torch.compile(mean_pool, mode="reduce-overhead") if USE_TORCH_COMPILE else mean_pool
+
 @app.on_event("startup")
 async def startup_event():
-    global model, tokenizer
+    global model, tokenizer, request_queue, batcher_task
     model, tokenizer = load_model()
+    pretokenize_template()
+    if DEVICE.type == "cuda":
+        allocate_input_buffers()
+    if USE_TORCH_COMPILE:
+        # Compilation happens on first call and needs a working C/C++ toolchain
+        try:
+            warmup_model()
+            logger.info("Compiled model warmed up")
+        except Exception as e:
+            logger.warning(f"torch.compile failed, serving the eager model: {str(e)}")
+            disable_compile()
+    request_queue = asyncio.Queue()
+    batcher_task = asyncio.create_task(batcher_loop())
     logger.info("Model loaded successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the batcher and cancel generate requests still waiting in the queue."""
+    global request_queue, batcher_task
+    if batcher_task is not None:
+        batcher_task.cancel()
+        try:
+            await batcher_task
+        except asyncio.CancelledError:
+            pass
+    while request_queue is not None and not request_queue.empty():
+        request_queue.get_nowait()[3].cancel()
+    request_queue = batcher_task = None
+
+def build_input_text(prompt: str, context: Optional[str]) -> str:
+    """Prepend the retrieved context to a prompt."""
+    if context:
+        return f"Context: {context}\n\nQuestion: {prompt}\n\nAnswer:"
+    return prompt
+
 @app.post("/generate")
 async def generate_response(request: GenerateRequest):
     try:
         # Prepare input text
-        input_text = request.prompt
-        if request.context:
-            input_text = f"Context: {request.context}\n\nQuestion: {request.prompt}\n\nAnswer:"
-
-        # Tokenize input
-        inputs = tokenizer(input_text, return_tensors="pt", truncation=True)
-        inputs = inputs.to(DEVICE)
-
-        # Generate response
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_length=request.max_length,
-                temperature=request.temperature,
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id
-            )
+        input_text = build_input_text(request.prompt, request.context)
+        
+        # Encode here so a bad request fails on its own, not its whole batch
+        input_ids, max_new_tokens = await run_on_model_thread(
+            encode_request, request.prompt, request.context, request.max_length
+        )
 
-        # Decode response
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        # Queue for the batcher and wait for this request's response
+        future = asyncio.get_running_loop().create_future()
+        await request_queue.put((input_ids, max_new_tokens, request.temperature, future))
+        response = await future
         
         return {
             "response": response,
@@ -93,39 +419,147 @@ async def generate_response(request: GenerateRequest):
         logger.error(f"Error generating response: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/embed")
-async def get_embeddings(request: EmbeddingRequest):
+@app.post("/generate_stream")
+async def generate_stream(request: GenerateRequest):
+    """Stream the response as server-sent events, one text piece per event."""
     try:
-        # Get embeddings using the same model
-        with torch.no_grad():
-            inputs = tokenizer(
-                request.texts,
-                padding=True,
-                truncation=True,
-                return_tensors="pt"
-            ).to(DEVICE)
-            
-            # Get the hidden states from the last layer
-            outputs = model(**inputs, output_hidden_states=True)
-            
-            # Use mean pooling of last hidden state
-            last_hidden_state = outputs.hidden_states[-1]
-            attention_mask = inputs['attention_mask']
-            
-            # Calculate mean pooling
-            embeddings = []
-            for i in range(len(request.texts)):
-                mask = attention_mask[i].unsqueeze(-1)
-                masked_embeddings = last_hidden_state[i] * mask
-                mean_pooled = torch.sum(masked_embeddings, dim=0) / torch.sum(mask)
-                embeddings.append(mean_pooled.cpu().numpy())
-            
-            embeddings = np.array(embeddings)
+        input_ids, max_new_tokens = await run_on_model_thread(
+            encode_request, request.prompt, request.context, request.max_length
+        )
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors: List[Exception] = []
+        # Set when the response ends for any reason, including a client disconnect
+        cancelled = threading.Event()
+        
+        # Queued behind other model work; the streamer decodes on the model thread
+        asyncio.get_running_loop().run_in_executor(
+            model_executor,
+            stream_generate,
+            input_ids,
+            max_new_tokens,
+            request.temperature,
+            streamer,
+            errors,
+            cancelled
+        )
+        
+    except Exception as e:
+        logger.error(f"Error starting stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_generator():
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # The streamer is a blocking iterator; wait for it off the event loop
+                text = await loop.run_in_executor(None, next, streamer, None)
+                if text is None:
+                    break
+                if text:
+                    yield f"data: {orjson.dumps({'token': text}).decode()}\n\n"
             
-            return {
-                "embeddings": embeddings.tolist(),
-                "dimensions": embeddings.shape[-1]
+            if errors:
+                yield f"data: {orjson.dumps({'error': str(errors[0])}).decode()}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            # Stop generating and free the model thread if the client went away
+            cancelled.set()
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+@app.post("/generate_batch")
+async def generate_batch_responses(request: BatchGenerateRequest):
+    try:
+        # Prepare input texts
+        input_texts = [build_input_text(prompt, request.context) for prompt in request.prompts]
+        
+        encoded = await run_on_model_thread(
+            lambda: [encode_request(prompt, request.context, request.max_length) for prompt in request.prompts]
+        )
+        
+        # Queue all prompts together so the batcher picks them up in one batch
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in input_texts]
+        for (input_ids, max_new_tokens), future in zip(encoded, futures):
+            request_queue.put_nowait((input_ids, max_new_tokens, request.temperature, future))
+        responses = await asyncio.gather(*futures)
+        
+        return {
+            "responses": responses,
+            "input_texts": input_texts,
+            "model_info": {
+                "device": str(DEVICE),
+                "max_length": request.max_length,
+                "temperature": request.temperature
             }
+        }
+
+    except Exception as e:
+        logger.error(f"Error generating batch responses: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def embed_batch_size(size: int) -> int:
+    """Get the smallest batch bucket that fits, or a multiple of the largest."""
+    for bucket in EMBED_BATCH_BUCKETS:
+        if size <= bucket:
+            return bucket
+    largest = EMBED_BATCH_BUCKETS[-1]
+    return -(-size // largest) * largest
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed texts with the generation model, returned as float16 on the host."""
+    bucketed = embed_pool is not mean_pool
+    with torch.inference_mode():
+        inputs = tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            pad_to_multiple_of=EMBED_LENGTH_MULTIPLE if bucketed else None,
+            return_tensors="pt"
+        ).to(DEVICE)
+        input_ids = inputs['input_ids']
+        attention_mask = inputs['attention_mask']
+        
+        if bucketed:
+            # Fill the batch bucket with fully padded rows, dropped after pooling
+            extra = embed_batch_size(len(texts)) - len(texts)
+            input_ids = torch.nn.functional.pad(input_ids, (0, 0, 0, extra), value=tokenizer.pad_token_id)
+            attention_mask = torch.nn.functional.pad(attention_mask, (0, 0, 0, extra))
+        
+        # Inputs are left-padded, so positions count real tokens only
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+        
+        # Mean pooling of the last hidden state
+        embeddings = embed_pool(input_ids, attention_mask, position_ids)[:len(texts)].to(torch.float16)
+        
+        # Copy to the host in one transfer, through pinned memory on GPU
+        if embeddings.is_cuda:
+            host = torch.empty(embeddings.shape, dtype=embeddings.dtype, pin_memory=True)
+            host.copy_(embeddings, non_blocking=True)
+            torch.cuda.current_stream().synchronize()
+        else:
+            host = embeddings
+        return host.numpy()
+
+@app.post("/embed")
+async def get_embeddings(request: EmbeddingRequest, encoding: Literal["base64", "json"] = "base64"):
+    try:
+        # Get embeddings using the same model
+        host = await run_on_model_thread(embed_texts, request.texts)
+        
+        # Returned as responses directly: orjson serializes the array natively
+        if encoding == "json":
+            return ORJSONResponse({
+                "embeddings": host,
+                "dimensions": host.shape[-1]
+            })
+        
+        return ORJSONResponse({
+            "embeddings_b64": base64.b64encode(host.tobytes()).decode(),
+            "shape": list(host.shape),
+            "dtype": "float16",
+            "dimensions": host.shape[-1]
+        })
 
     except Exception as e:
         logger.error(f"Error generating embeddings: {str(e)}")
@@ -135,4 +569,8 @@ async def get_embeddings(request: EmbeddingRequest):
 async def health_check():
     if model is None or tokenizer is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
-    return {"status": "healthy", "device": str(DEVICE)}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "device": str(DEVICE),
+        "tokenize_cache": tokenize_cached.cache_info()._asdict()
+    }
\ No newline at end of file
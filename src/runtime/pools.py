@@ -0,0 +1,36 @@
+"""Shared executors for blocking work.
+
+One thread pool for I/O-bound calls and one process pool for CPU-bound
+work per process, instead of a ThreadPoolExecutor per component instance.
+Submit through ``run_in_pool`` so callers wait once a pool's backlog is
+full instead of queueing unbounded work.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# CPUs this process may run on; os.cpu_count() reports the whole host
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+# Affinity does not reflect container CPU quotas, so deployments size the pools
+# explicitly: each CPU worker process loads its own spaCy pipeline
+IO_WORKERS = int(os.getenv("WORKER_THREADS", str(min(32, CPU_COUNT))))
+CPU_WORKERS = int(os.getenv("MAX_WORKERS", str(CPU_COUNT)))
+
+# Tasks allowed to be queued or running per worker before submitters wait
+MAX_INFLIGHT_PER_WORKER = int(os.getenv("POOL_MAX_INFLIGHT_PER_WORKER", "4"))
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+
+_inflight: Dict[Executor, asyncio.Semaphore] = {
+    io_pool: asyncio.Semaphore(IO_WORKERS * MAX_INFLIGHT_PER_WORKER),
+    cpu_pool: asyncio.Semaphore(CPU_WORKERS * MAX_INFLIGHT_PER_WORKER),
+}
+
+async def run_in_pool(pool: Executor, func: Callable, *args) -> Any:
+    """Run ``func(*args)`` on a shared pool with bounded backpressure."""
+    async with _inflight[pool]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(pool, func, *args)
@@ -1,10 +1,16 @@
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
+import asyncio
+import os
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import OAuth2PasswordBearer
 import secrets
+import hashlib
+import time
+from cachetools import TLRUCache, TTLCache
+from rbloom import Bloom
 from dataclasses import dataclass
 import logging
 from enum import Enum
@@ -17,7 +23,11 @@ class SecurityConfig:
     REFRESH_TOKEN_EXPIRE_DAYS = 7
     
     # Password Hashing
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=int(os.getenv("BCRYPT_ROUNDS", "12"))
+    )
     
     # OAuth2
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -25,6 +35,14 @@ class SecurityConfig:
     # Rate Limiting
     RATE_LIMIT_MINUTE = 100
     RATE_LIMIT_HOUR = 1000
+    
+    # Token Verification Cache
+    VERIFY_CACHE_SIZE = 10_000
+    VERIFY_CACHE_TTL = 5  # Sekunden
+    
+    # Token Blacklist
+    REVOCATION_CAPACITY = 1_000_000
+    REVOCATION_FALSE_POSITIVE_RATE = 0.01
 
 class Role(str, Enum):
     ADMIN = "admin"
@@ -41,8 +59,24 @@ class UserData:
 class SecurityManager:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self._token_blacklist = set()
-        self._rate_limiters = {}
+        # Bloom-Filter als schneller Vorfilter, TLRU-Cache als exakte Prüfung;
+        # Einträge (SHA-256 des Tokens -> exp) verfallen mit dem Token
+        self._blacklist_bloom = Bloom(
+            SecurityConfig.REVOCATION_CAPACITY,
+            SecurityConfig.REVOCATION_FALSE_POSITIVE_RATE
+        )
+        self._token_blacklist = TLRUCache(
+            maxsize=SecurityConfig.REVOCATION_CAPACITY,
+            ttu=lambda _key, exp, _now: exp,
+            timer=time.time
+        )
+        # Benutzer -> [Minuten-Bucket, Minuten-Zähler, Stunden-Bucket, Stunden-Zähler]
+        self._rate_limiters: dict[str, list[int]] = {}
+        # SHA-256 des Tokens -> (UserData, exp)
+        self._verify_cache = TTLCache(
+            maxsize=SecurityConfig.VERIFY_CACHE_SIZE,
+            ttl=SecurityConfig.VERIFY_CACHE_TTL
+        )
 
     def create_access_token(
         self,
@@ -71,11 +105,17 @@ class SecurityManager:
     async def verify_token(self, token: str) -> UserData:
         """Verifiziert einen JWT Token."""
         try:
-            if token in self._token_blacklist:
+            key = hashlib.sha256(token.encode()).digest()
+            if key in self._blacklist_bloom and key in self._token_blacklist:
                 raise HTTPException(
                     status_code=401,
                     detail="Token has been revoked"
                 )
+            
+            # Kürzlich verifizierte Tokens ohne erneute Signaturprüfung
+            cached = self._verify_cache.get(key)
+            if cached is not None and cached[1] > time.time():
+                return cached[0]
                 
             payload = jwt.decode(
                 token,
@@ -93,12 +133,17 @@ class SecurityManager:
                     detail="Could not validate credentials"
                 )
                 
-            return UserData(
+            user_data = UserData(
                 username=username,
                 role=Role(role),
                 permissions=permissions
             )
             
+            # Höchstens bis zum Ablauf des Tokens cachen
+            self._verify_cache[key] = (user_data, payload.get("exp", 0))
+            
+            return user_data
+            
         except JWTError:
             raise HTTPException(
                 status_code=401,
@@ -120,47 +165,62 @@ class SecurityManager:
 
     async def rate_limit_check(self, user_data: UserData) -> bool:
         """Überprüft Rate Limiting für einen Benutzer."""
-        if user_data.username not in self._rate_limiters:
-            self._rate_limiters[user_data.username] = {
-                "minute": {"count": 0, "reset": datetime.utcnow()},
-                "hour": {"count": 0, "reset": datetime.utcnow()}
-            }
-            
-        limiter = self._rate_limiters[user_data.username]
-        now = datetime.utcnow()
+        minute = int(time.monotonic()) // 60
+        hour = minute // 60
+        limiter = self._rate_limiters.setdefault(
+            user_data.username,
+            [minute, 0, hour, 0]
+        )
         
         # Minute Reset
-        if (now - limiter["minute"]["reset"]).total_seconds() > 60:
-            limiter["minute"] = {"count": 0, "reset": now}
+        if limiter[0] != minute:
+            limiter[0] = minute
+            limiter[1] = 0
             
         # Hour Reset
-        if (now - limiter["hour"]["reset"]).total_seconds() > 3600:
-            limiter["hour"] = {"count": 0, "reset": now}
+        if limiter[2] != hour:
+            limiter[2] = hour
+            limiter[3] = 0
             
         # Check Limits
-        if (limiter["minute"]["count"] >= SecurityConfig.RATE_LIMIT_MINUTE or
-            limiter["hour"]["count"] >= SecurityConfig.RATE_LIMIT_HOUR):
+        if (limiter[1] >= SecurityConfig.RATE_LIMIT_MINUTE or
+            limiter[3] >= SecurityConfig.RATE_LIMIT_HOUR):
             return False
             
         # Update Counters
-        limiter["minute"]["count"] += 1
-        limiter["hour"]["count"] += 1
+        limiter[1] += 1
+        limiter[3] += 1
         
         return True
 
     def revoke_token(self, token: str):
-        """Widerruft einen Token."""
-        self._token_blacklist.add(token)
+        """Widerruft einen Token bis zu seinem Ablauf."""
+        key = hashlib.sha256(token.encode()).digest()
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            exp = None
+        if not isinstance(exp, (int, float)):
+            # Ohne lesbares exp so lange sperren wie die längste Token-Laufzeit
+            exp = time.time() + SecurityConfig.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+            
+        self._blacklist_bloom.add(key)
+        self._token_blacklist[key] = exp
+        self._verify_cache.pop(key, None)
 
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        """Verifiziert ein Passwort."""
-        return SecurityConfig.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
+        """Verifiziert ein Passwort (bcrypt läuft in einem Worker-Thread)."""
+        return await asyncio.to_thread(
+            SecurityConfig.pwd_context.verify,
+            plain_password,
+            hashed_password
+        )
 
     @staticmethod
-    def get_password_hash(password: str) -> str:
-        """Erstellt einen Passwort-Hash."""
-        return SecurityConfig.pwd_context.hash(password)
+    async def get_password_hash(password: str) -> str:
+        """Erstellt einen Passwort-Hash (bcrypt läuft in einem Worker-Thread)."""
+        return await asyncio.to_thread(SecurityConfig.pwd_context.hash, password)
 
 # Middleware für Security
 class SecurityMiddleware:
@@ -190,7 +250,7 @@ class SecurityMiddleware:
                 # Response Headers
                 response.headers["X-Rate-Limit-Remaining"] = str(
                     SecurityConfig.RATE_LIMIT_MINUTE - 
-                    self.security_manager._rate_limiters[user_data.username]["minute"]["count"]
+                    self.security_manager._rate_limiters[user_data.username][1]
                 )
                 
                 return response
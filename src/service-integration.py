@@ -1,12 +1,19 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 import asyncio
+import random
+import time
 from dataclasses import dataclass
 import aiohttp
+import base64
 import logging
+import numpy as np
 from contextlib import asynccontextmanager
 from prometheus_client import Counter, Histogram
 import json
-import backoff
+
+# Retry-Backoff: exponentiell mit vollem Jitter
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10.0
 
 @dataclass
 class ServiceConfig:
@@ -24,26 +31,31 @@ class CircuitBreaker:
         self.failures = 0
         self.last_failure_time = 0
         self.state = "closed"  # closed, open, half-open
+        self._lock = asyncio.Lock()
 
     async def call(self, func, *args, **kwargs):
-        if self.state == "open":
-            if time.time() - self.last_failure_time > self.reset_timeout:
-                self.state = "half-open"
-            else:
-                raise Exception("Circuit breaker is open")
+        async with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.last_failure_time > self.reset_timeout:
+                    self.state = "half-open"
+                else:
+                    raise Exception("Circuit breaker is open")
 
         try:
             result = await func(*args, **kwargs)
+        except Exception as e:
+            async with self._lock:
+                self.failures += 1
+                self.last_failure_time = time.monotonic()
+                if self.failures >= self.threshold:
+                    self.state = "open"
+            raise e
+
+        async with self._lock:
             if self.state == "half-open":
                 self.state = "closed"
                 self.failures = 0
-            return result
-        except Exception as e:
-            self.failures += 1
-            self.last_failure_time = time.time()
-            if self.failures >= self.threshold:
-                self.state = "open"
-            raise e
+        return result
 
 class ServiceIntegration:
     def __init__(self):
@@ -66,7 +78,16 @@ class ServiceIntegration:
 
     async def initialize(self):
         """Initialisiert die Service Integration."""
-        self.session = aiohttp.ClientSession()
+        # Großer Keep-Alive-Pool pro Host; Timeouts werden pro Aufruf gesetzt
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=128,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=None)
+        )
         
         # Standard-Services registrieren
         self.register_service(ServiceConfig(
@@ -99,11 +120,13 @@ class ServiceIntegration:
             threshold=config.circuit_breaker_threshold
         )
 
-    @backoff.on_exception(
-        backoff.expo,
-        (aiohttp.ClientError, asyncio.TimeoutError),
-        max_tries=3
-    )
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Nur Netzwerkfehler, Timeouts und 5xx werden wiederholt."""
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status >= 500
+        return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
     async def call_service(
         self,
         service_name: str,
@@ -133,18 +156,25 @@ class ServiceIntegration:
                     url=url,
                     json=data,
                     headers=headers,
-                    timeout=service_config.timeout
+                    timeout=aiohttp.ClientTimeout(total=service_config.timeout)
                 ) as response:
                     response.raise_for_status()
                     return await response.json()
 
-        try:
-            return await circuit_breaker.call(make_request)
-        except Exception as e:
-            self.logger.error(
-                f"Service call failed: {service_name} {method} {endpoint}: {str(e)}"
+        attempts = max(1, service_config.retry_count)
+        for attempt in range(attempts):
+            try:
+                return await circuit_breaker.call(make_request)
+            except Exception as e:
+                if attempt == attempts - 1 or not self._is_retryable(e):
+                    self.logger.error(
+                        f"Service call failed: {service_name} {method} {endpoint}: {str(e)}"
+                    )
+                    raise
+            
+            await asyncio.sleep(
+                random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
             )
-            raise
 
 class ModelService:
     def __init__(self, service_integration: ServiceIntegration):
@@ -152,10 +182,21 @@ class ModelService:
 
     async def generate_response(
         self,
-        prompt: str,
+        prompt: Union[str, List[str]],
         context: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Generiert eine Antwort vom Modell-Service."""
+        """Generiert eine Antwort vom Modell-Service (mehrere Prompts in einem Batch)."""
+        if isinstance(prompt, list):
+            return await self.service_integration.call_service(
+                service_name="model",
+                method="POST",
+                endpoint="/generate_batch",
+                data={
+                    "prompts": prompt,
+                    "context": context
+                }
+            )
+        
         return await self.service_integration.call_service(
             service_name="model",
             method="POST",
@@ -171,7 +212,7 @@ class ModelService:
         texts: List[str]
     ) -> Dict[str, Any]:
         """Generiert Embeddings vom Modell-Service."""
-        return await self.service_integration.call_service(
+        result = await self.service_integration.call_service(
             service_name="model",
             method="POST",
             endpoint="/embed",
@@ -179,6 +220,13 @@ class ModelService:
                 "texts": texts
             }
         )
+        
+        # Binäre fp16-Embeddings in ein (N, d)-Array dekodieren
+        result["embeddings"] = np.frombuffer(
+            base64.b64decode(result.pop("embeddings_b64")),
+            dtype=result["dtype"]
+        ).reshape(result["shape"])
+        return result
 
 class ChromaService:
     def __init__(self, service_integration: ServiceIntegration):
@@ -1,8 +1,8 @@
 import streamlit as st
-import requests
+import httpx
 import json
 import os
-from typing import Optional
+from typing import Iterator, Optional
 import pandas as pd
 
 # Configure the API endpoint
@@ -14,11 +14,20 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_client() -> httpx.Client:
+    """Shared keep-alive HTTP client for the API, reused across reruns."""
+    return httpx.Client(
+        base_url=API_URL,
+        timeout=60.0,
+        limits=httpx.Limits(max_keepalive_connections=32)
+    )
+
 def query_documents(query: str, context_size: int = 3) -> Optional[dict]:
     """Query the RAG system API."""
     try:
-        response = requests.post(
-            f"{API_URL}/query",
+        response = get_client().post(
+            "/query",
             json={"text": query, "context_size": context_size}
         )
         return response.json()
@@ -26,11 +35,30 @@ def query_documents(query: str, context_size: int = 3) -> Optional[dict]:
         st.error(f"Error querying API: {str(e)}")
         return None
 
+def stream_query(query: str, context_size: int = 3) -> Iterator[str]:
+    """Stream the response to a query from the API as it is generated."""
+    with get_client().stream(
+        "POST",
+        "/query_stream",
+        json={"text": query, "context_size": context_size}
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            event = json.loads(data)
+            if "error" in event:
+                raise RuntimeError(event["error"])
+            yield event["token"]
+
 def upload_document(content: str, metadata: dict) -> bool:
     """Upload a document to the RAG system."""
     try:
-        response = requests.post(
-            f"{API_URL}/documents",
+        response = get_client().post(
+            "/documents",
             json={"content": content, "metadata": metadata}
         )
         return response.status_code == 200
@@ -44,16 +72,6 @@ with st.sidebar:
     uploaded_file = st.file_uploader("Choose a file", type=["txt", "pdf", "md"])
     
     if uploaded_file is not None:
-        content = uploaded_file.read()
-        
-        if uploaded_file.type == "application/pdf":
-            # Handle PDF
-            # You'll need to add PDF processing logic here
-            pass
-        else:
-            # Handle text files
-            content = content.decode("utf-8")
-            
         metadata = {
             "filename": uploaded_file.name,
             "type": uploaded_file.type,
@@ -61,6 +79,17 @@ with st.sidebar:
         }
         
         if st.button("Upload Document"):
+            # Only read the file when it is actually uploaded, not on every rerun
+            content = uploaded_file.getvalue()
+            
+            if uploaded_file.type == "application/pdf":
+                # Handle PDF
+                # You'll need to add PDF processing logic here
+                pass
+            else:
+                # Handle text files
+                content = content.decode("utf-8")
+            
             if upload_document(content, metadata):
                 st.success("Document uploaded successfully!")
             else:
@@ -71,9 +100,17 @@ st.title("RAG System Query Interface")
 
 query = st.text_area("Enter your query:", height=100)
 context_size = st.slider("Context Size", min_value=1, max_value=10, value=3)
+# Off by default: streams bypass the model server's request batching
+stream_response = st.checkbox("Stream response", value=False)
 
 if st.button("Submit Query"):
-    if query:
+    if query and stream_response:
+        st.subheader("Response")
+        try:
+            st.write_stream(stream_query(query, context_size))
+        except Exception as e:
+            st.error(f"Error querying API: {str(e)}")
+    elif query:
         with st.spinner("Processing query..."):
             result = query_documents(query, context_size)
             
@@ -0,0 +1,131 @@
+import pytest
+import asyncio
+import numpy as np
+from unittest.mock import Mock, patch
+from cachetools import Cache
+from src.chroma_optimized import DocumentChunk, EmbeddingSlabCache, OptimizedChromaDB, QueryResultCache
+
+@pytest.fixture
+def mock_collection():
+    with patch('chromadb.HttpClient') as mock:
+        collection = Mock()
+        collection._embedding_function.side_effect = lambda texts: [np.full(4, float(len(t))) for t in texts]
+        mock.return_value.get_collection.return_value = collection
+        yield collection
+
+def make_documents(prefix, count):
+    return [DocumentChunk(content=f"{prefix}-{i}", metadata={"source": prefix}) for i in range(count)]
+
+def written_documents(collection):
+    """Map each written id to its document across all collection.add calls."""
+    written = {}
+    for call in collection.add.call_args_list:
+        written.update(zip(call.kwargs["ids"], call.kwargs["documents"]))
+    return written
+
+def assert_slots_accounted(cache):
+    """Every slab row is either free or held by exactly one cached entry."""
+    used = [Cache.__getitem__(cache, key) for key in Cache.__iter__(cache)]
+    assert len(used) == len(set(used))
+    assert not set(used) & set(cache._free)
+    assert len(used) + len(cache._free) == cache.maxsize + 1
+
+def test_embedding_cache_slot_accounting():
+    cache = EmbeddingSlabCache(maxsize=3, ttl=60)
+    for i in range(5):
+        cache.put_embedding(f"text-{i}", np.full(4, float(i + 1)))
+        assert_slots_accounted(cache)
+    assert len(cache) == 3
+
+    # Overwriting a key reuses the accounting rather than leaking its old row
+    cache.put_embedding("text-4", np.ones(4))
+    assert_slots_accounted(cache)
+
+    cache.expire(cache.timer() + 120)
+    assert len(cache) == 0
+    assert_slots_accounted(cache)
+
+    for i in range(3):
+        cache.put_embedding(f"again-{i}", np.full(4, -1.0))
+    cache.clear()
+    assert len(cache) == 0
+    assert_slots_accounted(cache)
+
+def test_embedding_cache_roundtrip():
+    cache = EmbeddingSlabCache(maxsize=2, ttl=60)
+    embedding = np.array([0.5, -1.0, 0.25, 0.0], dtype=np.float32)
+    cache.put_embedding("text", embedding)
+    np.testing.assert_allclose(cache.get_embedding("text"), embedding, atol=1 / 127)
+    assert cache.get_embedding("missing") is None
+
+def test_query_cache_invalidate_intersecting():
+    cache = QueryResultCache(maxsize=10)
+    cache["q1"] = {"ids": ["a", "b"]}
+    cache["q2"] = {"ids": ["b", "c"]}
+    cache["q3"] = {"ids": ["d"]}
+
+    assert cache.invalidate(["a"]) == 1
+    assert "q1" not in cache
+    assert "q2" in cache and "q3" in cache
+
+    assert cache.invalidate(["c", "x"]) == 1
+    assert list(cache) == ["q3"]
+    assert set(cache._keys_by_id) == {"d"}
+
+def test_query_cache_eviction_updates_index():
+    cache = QueryResultCache(maxsize=1)
+    cache["q1"] = {"ids": ["a"]}
+    cache["q2"] = {"ids": ["b"]}
+    assert "q1" not in cache
+    assert set(cache._keys_by_id) == {"b"}
+    assert cache.invalidate(["a"]) == 0
+
+@pytest.mark.asyncio
+async def test_add_documents_returns_ids_in_order(mock_collection):
+    db = OptimizedChromaDB("localhost", 8000, "test", max_batch=64, max_wait=0.05)
+    batches = [make_documents(f"doc{k}", 25) for k in range(4)]
+
+    results = await asyncio.gather(*(db.add_documents(docs, batch_size=10) for docs in batches))
+    await db.close()
+
+    # Slices of different callers were coalesced into shared writes
+    assert mock_collection.add.call_count < 12
+    written = written_documents(mock_collection)
+    for docs, ids in zip(batches, results):
+        assert len(ids) == len(set(ids)) == len(docs)
+        assert [written[doc_id] for doc_id in ids] == [doc.content for doc in docs]
+
+@pytest.mark.asyncio
+async def test_update_documents_keeps_ids(mock_collection):
+    db = OptimizedChromaDB("localhost", 8000, "test")
+    ids = await db.add_documents(make_documents("old", 2))
+    mock_collection.add.reset_mock()
+
+    await db.update_documents(make_documents("new", 2), ids)
+    await db.close()
+
+    mock_collection.delete.assert_called_once_with(ids=ids)
+    assert mock_collection.add.call_args.kwargs["ids"] == ids
+
+@pytest.mark.asyncio
+async def test_batches_respect_max_batch(mock_collection):
+    db = OptimizedChromaDB("localhost", 8000, "test", max_batch=256, max_wait=0.05)
+    await asyncio.gather(*(db.add_documents(make_documents(f"doc{k}", 150), batch_size=150) for k in range(2)))
+    await db.close()
+
+    sizes = [len(call.kwargs["ids"]) for call in mock_collection.add.call_args_list]
+    assert sizes == [150, 150]
+
+@pytest.mark.asyncio
+async def test_cancel_during_next_batch(mock_collection):
+    db = OptimizedChromaDB("localhost", 8000, "test", max_batch=1000, max_wait=10)
+    add = asyncio.create_task(db.add_documents(make_documents("doc", 3)))
+
+    # The writer has dequeued the slice and is waiting for more to coalesce
+    await asyncio.sleep(0.1)
+    assert db._write_queue.empty()
+
+    await db.close()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(add, 1)
+    mock_collection.add.assert_not_called()
@@ -0,0 +1,63 @@
+import pytest
+import random
+import numpy as np
+from src.api.document_processor import Sentence, _chunk_bounds, _rolling_chunks
+
+def reference_chunks(sentences, chunk_size, chunk_overlap):
+    """The original list-based chunker, with overlap counted in sentences."""
+    chunks = []
+    current_chunk = []
+    current_size = 0
+
+    for sentence in sentences:
+        if current_size + sentence.word_count > chunk_size:
+            if current_chunk:
+                chunks.append(current_chunk)
+            overlap_start = max(0, len(current_chunk) - chunk_overlap)
+            current_chunk = current_chunk[overlap_start:] + [sentence]
+            current_size = sum(s.word_count for s in current_chunk)
+        else:
+            current_chunk.append(sentence)
+            current_size += sentence.word_count
+
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+def make_sentences(seed, count, max_words):
+    rng = random.Random(seed)
+    return [
+        Sentence(text=f"sentence {i}", word_count=rng.randint(1, max_words), content_words=0)
+        for i in range(count)
+    ]
+
+def texts(chunks):
+    return [[sentence.text for sentence in chunk] for chunk in chunks]
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [
+    (8, 0),
+    (8, 1),
+    (16, 2),
+    (64, 4),
+    (5, 5),     # overlap as large as a whole window
+    (10, 50),   # overlap larger than any window
+])
+@pytest.mark.parametrize("seed", range(5))
+def test_chunkers_match_reference(seed, chunk_size, chunk_overlap):
+    sentences = make_sentences(seed, count=200, max_words=12)
+    expected = texts(reference_chunks(sentences, chunk_size, chunk_overlap))
+
+    assert texts(_rolling_chunks(iter(sentences), chunk_size, chunk_overlap)) == expected
+
+    lens = np.array([s.word_count for s in sentences], dtype=np.int32)
+    starts, ends = _chunk_bounds(lens, chunk_size, chunk_overlap)
+    assert texts(sentences[start:end] for start, end in zip(starts, ends)) == expected
+
+@pytest.mark.parametrize("count", [0, 1])
+def test_chunkers_handle_short_input(count):
+    sentences = make_sentences(0, count=count, max_words=100)
+    expected = texts(reference_chunks(sentences, 8, 2))
+
+    assert texts(_rolling_chunks(iter(sentences), 8, 2)) == expected
+    starts, ends = _chunk_bounds(np.array([s.word_count for s in sentences], dtype=np.int32), 8, 2)
+    assert texts(sentences[start:end] for start, end in zip(starts, ends)) == expected
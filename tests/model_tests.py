@@ -1,11 +1,24 @@
+import base64
 import pytest
 from fastapi.testclient import TestClient
+import numpy as np
+import orjson
 import torch
 from unittest.mock import Mock, patch
-from src.model.model_server import app, load_model
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+from src.model.model_server import MAX_LENGTH, app, load_model
 
 client = TestClient(app)
 
+TINY_VOCAB = [
+    "[UNK]", "<eos>", "Context", "Question", "Answer", ":", "?", ".",
+    "first", "second", "third", "question", "shared", "context",
+    "document", "what", "is", "the", "meaning", "of", "life"
+]
+
 @pytest.fixture
 def mock_model():
     with patch('transformers.AutoModelForCausalLM.from_pretrained') as mock_model:
@@ -25,6 +38,41 @@ def mock_model():
             
             yield model, tokenizer
 
+@pytest.fixture
+def tiny_model():
+    """A small random GPT-2 and word-level tokenizer standing in for the checkpoint."""
+    torch.manual_seed(0)
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=Tokenizer(WordLevel(
+            {token: i for i, token in enumerate(TINY_VOCAB)},
+            unk_token="[UNK]"
+        )),
+        unk_token="[UNK]",
+        eos_token="<eos>"
+    )
+    tokenizer.backend_tokenizer.pre_tokenizer = Whitespace()
+    
+    # No eos id, so generation always runs to its token budget
+    config = GPT2Config(
+        vocab_size=len(TINY_VOCAB),
+        n_positions=128,
+        n_embd=32,
+        n_layer=2,
+        n_head=2,
+        bos_token_id=None,
+        eos_token_id=None
+    )
+    return GPT2LMHeadModel(config).eval(), tokenizer
+
+@pytest.fixture
+def started_client(tiny_model):
+    """A client that runs the server startup against the tiny model."""
+    model, tokenizer = tiny_model
+    with patch('transformers.AutoModelForCausalLM.from_pretrained', return_value=model):
+        with patch('transformers.AutoTokenizer.from_pretrained', return_value=tokenizer):
+            with TestClient(app) as started:
+                yield started
+
 @pytest.fixture
 def sample_generate_request():
     return {
@@ -59,16 +107,80 @@ def test_generate_no_context(mock_model):
     response = client.post("/generate", json=request)
     assert response.status_code == 200
 
-def test_embeddings(mock_model, sample_embedding_request):
-    response = client.post("/embed", json=sample_embedding_request)
+def test_generate_stream(started_client, sample_generate_request):
+    response = started_client.post("/generate_stream", json=sample_generate_request)
     assert response.status_code == 200
-    assert "embeddings" in response.json()
-    assert "dimensions" in response.json()
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = [line[len("data: "):] for line in response.text.splitlines() if line]
+    assert events[-1] == "[DONE]"
+    tokens = [orjson.loads(event) for event in events[:-1]]
+    assert tokens
+    assert all(set(token) == {"token"} for token in tokens)
+
+def test_generate_batch(started_client, tiny_model):
+    model, _ = tiny_model
+    prompts = ["first question", "second question", "third"]
+    request = {
+        "prompts": prompts,
+        "context": "shared context",
+        "max_length": 24
+    }
+    with patch.object(model, "generate", wraps=model.generate) as generate:
+        response = started_client.post("/generate_batch", json=request)
+    assert response.status_code == 200
+    
+    # All prompts share one generate call and come back in prompt order
+    assert generate.call_count == 1
+    responses = response.json()["responses"]
+    assert len(responses) == 3
+    for prompt, text in zip(prompts, responses):
+        assert f"Question : {prompt} Answer :" in text
+    assert "model_info" in response.json()
+
+def test_invalid_generate_batch_request():
+    response = client.post("/generate_batch", json={"prompt": "Not a list"})
+    assert response.status_code == 422
+
+def test_embeddings(started_client, sample_embedding_request):
+    response = started_client.post("/embed", json=sample_embedding_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["dtype"] == "float16"
+    assert data["shape"] == [2, data["dimensions"]]
+    
+    embeddings = np.frombuffer(base64.b64decode(data["embeddings_b64"]), dtype=np.float16)
+    embeddings = embeddings.reshape(data["shape"])
+    assert np.isfinite(embeddings).all()
+
+def test_embeddings_json(started_client, sample_embedding_request):
+    response = started_client.post("/embed?encoding=json", json=sample_embedding_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert np.array(data["embeddings"]).shape == (2, data["dimensions"])
+    
+    # Same values as the base64 encoding
+    encoded = started_client.post("/embed", json=sample_embedding_request).json()
+    embeddings = np.frombuffer(base64.b64decode(encoded["embeddings_b64"]), dtype=np.float16)
+    np.testing.assert_array_equal(
+        np.array(data["embeddings"], dtype=np.float16),
+        embeddings.reshape(encoded["shape"])
+    )
 
 def test_invalid_generate_request():
     response = client.post("/generate", json={})
     assert response.status_code == 422
 
+@pytest.mark.parametrize("endpoint", ["/generate", "/generate_stream"])
+def test_generate_null_max_length(endpoint):
+    response = client.post(endpoint, json={"prompt": "Test prompt", "max_length": None})
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("endpoint", ["/generate", "/generate_stream"])
+def test_generate_max_length_over_limit(endpoint):
+    response = client.post(endpoint, json={"prompt": "Test prompt", "max_length": MAX_LENGTH + 1})
+    assert response.status_code == 422
+
 def test_model_error_handling(mock_model, sample_generate_request):
     model, _ = mock_model
     model.generate.side_effect = RuntimeError("GPU out of memory")
@@ -0,0 +1,63 @@
+import pytest
+import importlib.util
+import os
+import time
+from pathlib import Path
+from fastapi import HTTPException
+from jose import jwt
+
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+# The module file name is not importable with a plain import statement
+_spec = importlib.util.spec_from_file_location(
+    "security_config",
+    Path(__file__).resolve().parent.parent / "src" / "security-config.py"
+)
+security_config = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(security_config)
+
+@pytest.fixture
+def manager():
+    return security_config.SecurityManager()
+
+@pytest.fixture
+def token(manager):
+    return manager.create_access_token({"sub": "alice", "role": "user"})
+
+@pytest.mark.asyncio
+async def test_cached_token_rejected_after_revoke(manager, token):
+    user = await manager.verify_token(token)
+    assert user.username == "alice"
+    # Second verification is served from the verify cache
+    assert await manager.verify_token(token) == user
+
+    manager.revoke_token(token)
+    with pytest.raises(HTTPException) as error:
+        await manager.verify_token(token)
+    assert error.value.status_code == 401
+    assert error.value.detail == "Token has been revoked"
+
+@pytest.mark.asyncio
+async def test_revoke_leaves_other_tokens_valid(manager, token):
+    other = manager.create_access_token({"sub": "bob", "role": "user"})
+    manager.revoke_token(token)
+    assert (await manager.verify_token(other)).username == "bob"
+
+@pytest.mark.parametrize("malformed", [
+    "not-a-jwt",
+    jwt.encode({"sub": "alice", "role": "user", "exp": "soon"}, "test-secret", algorithm="HS256"),
+    jwt.encode({"sub": "alice", "role": "user"}, "test-secret", algorithm="HS256"),
+], ids=["not-a-jwt", "non-numeric-exp", "no-exp"])
+@pytest.mark.asyncio
+async def test_malformed_token_stays_blocked(manager, malformed):
+    manager.revoke_token(malformed)
+
+    with pytest.raises(HTTPException) as error:
+        await manager.verify_token(malformed)
+    assert error.value.detail == "Token has been revoked"
+
+    # Without a readable exp the entry lives as long as the longest token lifetime
+    manager._token_blacklist.expire(time.time() + 86400)
+    with pytest.raises(HTTPException) as error:
+        await manager.verify_token(malformed)
+    assert error.value.detail == "Token has been revoked"
@@ -0,0 +1,70 @@
+import pytest
+import asyncio
+import importlib.util
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock, patch
+import aiohttp
+
+# The module file name is not importable with a plain import statement
+_spec = importlib.util.spec_from_file_location(
+    "service_integration",
+    Path(__file__).resolve().parent.parent / "src" / "service-integration.py"
+)
+service_integration = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(service_integration)
+
+def response_error(status):
+    return aiohttp.ClientResponseError(request_info=Mock(), history=(), status=status)
+
+@pytest.fixture(scope="module")
+def integration():
+    # Metrics register globally, so the module shares one instance
+    integration = service_integration.ServiceIntegration()
+    integration.register_service(service_integration.ServiceConfig(
+        name="model",
+        host="localhost",
+        port=8080,
+        timeout=1.0,
+        retry_count=3,
+        circuit_breaker_threshold=100
+    ))
+    return integration
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(service_integration, "RETRY_BASE_DELAY", 0)
+
+@pytest.mark.parametrize("error,retryable", [
+    (response_error(500), True),
+    (response_error(503), True),
+    (response_error(400), False),
+    (response_error(404), False),
+    (aiohttp.ClientConnectionError(), True),
+    (asyncio.TimeoutError(), True),
+    (ValueError("bad payload"), False),
+])
+def test_is_retryable(error, retryable):
+    assert service_integration.ServiceIntegration._is_retryable(error) is retryable
+
+@pytest.mark.asyncio
+async def test_call_service_retries_5xx(integration):
+    breaker = integration.circuit_breakers["model"]
+    with patch.object(breaker, "call", AsyncMock(side_effect=[response_error(503), {"status": "ok"}])) as call:
+        assert await integration.call_service("model", "GET", "/health") == {"status": "ok"}
+    assert call.await_count == 2
+
+@pytest.mark.asyncio
+async def test_call_service_does_not_retry_4xx(integration):
+    breaker = integration.circuit_breakers["model"]
+    with patch.object(breaker, "call", AsyncMock(side_effect=response_error(404))) as call:
+        with pytest.raises(aiohttp.ClientResponseError):
+            await integration.call_service("model", "GET", "/missing")
+    assert call.await_count == 1
+
+@pytest.mark.asyncio
+async def test_call_service_gives_up_after_retry_count(integration):
+    breaker = integration.circuit_breakers["model"]
+    with patch.object(breaker, "call", AsyncMock(side_effect=response_error(502))) as call:
+        with pytest.raises(aiohttp.ClientResponseError):
+            await integration.call_service("model", "GET", "/health")
+    assert call.await_count == 3